@@ -0,0 +1,15 @@
+###############################################################################
+# manifest.py
+#
+# MicroPython manifest for freezing MicroPython-MiFlora into the firmware
+#
+# Frozen bytecode is executed from flash - it is neither compiled at import
+# nor copied into RAM. With opt=3, line number information is stripped.
+#
+# Usage (e.g. ESP32 port):
+#   $ make -C ports/esp32 FROZEN_MANIFEST=/path/to/MicroPython-MiFlora/manifest.py
+#
+# See https://docs.micropython.org/en/latest/reference/manifest.html
+###############################################################################
+
+freeze(".", ("ble_advertising.py", "miflora.py"), opt=3)
@@ -59,6 +59,22 @@
 #          fixed several bugs and cleaned up code
 #          initial release on GitHub
 # 20210506 Minor changes to improve integration as module
+# 20261015 Performance improvements (reduced allocations in IRQ handlers,
+#          native/viper code, table-based IRQ dispatch)
+#          added coroutines (scan_async(), gap_connect_async(), ...)
+#          and await_state()/await_connection()
+#          added batch mode (set_sensors(), select())
+#          added exchange_mtu()
+#          Breaking changes:
+#          - demo_man() and demo_auto() replaced by demo()
+#          - VERBOSITY renamed to _VERBOSITY; _VERBOSITY and AUTO_MODE are
+#            constants now (cannot be changed at runtime)
+#          - on_notify() callback is invoked with a list of notification data;
+#            notifications are passed by process_notify() or notify_task()
+#          - 'services' and 'characteristics' are keyed by UUID objects
+#            instead of str(uuid)
+#          - value() returns the result of the last read only
+#            (notifications are not reflected anymore)
 #
 # ToDo:
 # 
@@ -69,27 +85,36 @@
 
 import ubluetooth
 import time
-import struct
 import ble_advertising
 from ble_advertising import decode_services, decode_name
-import binascii
+import micropython
 
 from micropython import const
 
-VERBOSITY = 0
+try:
+    import uasyncio
+except ImportError:
+    # Fall back to polling in wait_for()/wait_for_connection()
+    uasyncio = None
+
+# Debug output verbosity (0...3)
+# Note: Declared as const() - debug code guarded by 'if _VERBOSITY >= n:' is removed by the compiler.
+#       (All calls of MiFlora._debug() are guarded this way.)
+_VERBOSITY = const(0)
 
 # Bluetooth MAC addresses of Miflora sensors
 # - Linux: $ sudo hcitool lescan
 # - Android App "nRF Connect"
 #
 # (Example:)
-miflora_sensors = [ 
-    bytes(b'\xC4\x7C\x8D\x66\xA5\x3D')
-#    bytes(b'\xC4\x7C\x8D\x66\xA4\xD5'), # #4
-#    bytes(b'\xC4\x7C\x8D\x66\xA1\xEA'), # #3
-#    bytes(b'\xC4\x7C\x8D\x66\xA4\xF5'), # #2
-#    bytes(b'\x80\xEA\xCA\x88\xFE\xED')  # #1
-]
+# Note: This is a tuple (immutable) - the trailing comma is required for a single element!
+miflora_sensors = ( 
+    b'\xC4\x7C\x8D\x66\xA5\x3D',
+#    b'\xC4\x7C\x8D\x66\xA4\xD5', # #4
+#    b'\xC4\x7C\x8D\x66\xA1\xEA', # #3
+#    b'\xC4\x7C\x8D\x66\xA4\xF5', # #2
+#    b'\x80\xEA\xCA\x88\xFE\xED', # #1
+)
 
 # If SCAN_DEVICES == True, the demo functions start with scanning for devices and the device name and
 # the RSSI are retrieved from the scan results. Otherwise the demo functions start with connecting to
@@ -107,15 +132,29 @@ DISCOVER_SERVICES  = False
 _DISCOVER_CHARACTERISTICS = False
 DISCOVER_CHARACTERISTICS  = False
 
+# The MTU exchange is not required for Miflora, because its payloads (max. 16 bytes) fit into the
+# default ATT MTU (23 bytes), but might be useful in other BLE applications with larger characteristics
+# (avoids long reads split across several PDUs).
+# If _EXCHANGE_MTU == True, BLE.gattc_exchange_mtu() is called in _IRQ_PERIPHERAL_CONNECT state
+# with the preferred MTU _MTU.
+_EXCHANGE_MTU = False
+_MTU          = const(185)
+
 
 # If AUTO_MODE is enabled, the BLE state machine is started with
 # MiFlora.scan() or MiFlora.gap_connect() - as needed - and automatically progresses
 # through the following stages (AUTO_MODE transitions marked with '*'):
+# (In batch mode - see MiFlora.set_sensors() - the state machine stops after
+#  _IRQ_SCAN_DONE and is restarted for each sensor with MiFlora.gap_connect().)
 #  1. _IRQ_SCAN_RESULT
 #     if completed: -> _IRQ_SCAN_DONE
 #  2. _IRQ_SCAN_DONE
 #     -> _IRQ_PERIPHERAL_CONNECT
 #  3. _IRQ_PERIPHERAL_CONNECT
+#     if _EXCHANGE_MTU: -> _IRQ_MTU_EXCHANGED
+#     elif _DISCOVER_SERVICES: -> _IRQ_GATTC_SERVICE_RESULT
+#     else S_READ_FIRMWARE_DONE
+# 3a. _IRQ_MTU_EXCHANGED
 #     if _DISCOVER_SERVICES: -> _IRQ_GATTC_SERVICE_RESULT
 #     else S_READ_FIRMWARE_DONE
 #  4. _IRQ_GATTC_SERVICE_RESULT
@@ -135,9 +174,10 @@ DISCOVER_CHARACTERISTICS  = False
 # The application can start the state machine, perform other tasks, eventually wait until
 # the state S_READ_SENSOR_DONE is reached (or a timeout occurred) and finally disconnect
 # from the peripheral (MiFlora.disconnect()).
-AUTO_MODE = 1
+# (Declared as const() - the code for the disabled mode is removed by the compiler.)
+AUTO_MODE = const(1)
 
-# Time constants (T_WAIT: ms / others: s)
+# Time constants (T_WAIT: ms - max. polling interval / others: s)
 _T_WAIT  = const(100)
 _T_RETRY = const(10)
 _T_CYCLE = const(20)
@@ -175,6 +215,21 @@ _IRQ_ENCRYPTION_UPDATE              = const(28)
 _IRQ_GET_SECRET                     = const(29)
 _IRQ_SET_SECRET                     = const(30)
 
+# Default ATT MTU
+_MTU_DEFAULT                        = const(23)
+
+# Size of IRQ handler table (must be greater than highest IRQ ID)
+_N_IRQ_HANDLERS                     = const(32)
+
+# Notification ring buffer - number of slots / slot size [bytes]
+# (longer notifications are truncated)
+_NOTIFY_SLOTS                       = const(8)
+_NOTIFY_SLOT_SIZE                   = const(24)
+
+# Size of read value buffer [bytes]
+# (longer read data is truncated)
+_VALUE_BUF_SIZE                     = const(32)
+
 # Advertising types (cf. https://docs.micropython.org/en/latest/library/ubluetooth.html)
 _ADV_IND         = const(0x00)
 _ADV_DIRECT_IND  = const(0x01)
@@ -182,10 +237,16 @@ _ADV_SCAN_IND    = const(0x02)
 _ADV_NONCONN_IND = const(0x03)
 _ADV_SCAN_RSP    = const(0x04)
 
+# Advertising type names (for debug output), indexed by advertising type
+_ADV_TYPE_NAMES  = ('ADV_IND', 'ADV_DIRECT_IND', 'ADV_SCAN_IND', 'ADV_NONCONN_IND', 'SCAN_RSP')
+
 # Address types (cf. https://docs.micropython.org/en/latest/library/ubluetooth.html)
 ADDR_TYPE_PUBLIC = const(0x00)
 ADDR_TYPE_RANDOM = const(0x01)
 
+# Address type names (for debug output), indexed by address type
+_ADDR_TYPE_NAMES = ('Public', 'Random')
+
 # Miflora Service / Characteristics UUIDs
 # (ROOT_SERVICE could be used for discovery)
 _GENERIC_ACCESS_SERVICE_UUID    = ubluetooth.UUID(0x1800)
@@ -202,6 +263,15 @@ _HANDLE_WRITE_MODE_CHANGE    = 0x33
 _DATA_MODE_CHANGE            = bytes([0xA0, 0x1F])
 _HANDLE_READ_SENSOR_DATA     = 0x35
 
+# AUTO_MODE sequence of GATT client accesses after connection/discovery:
+# (value handle, data to be written - None for read access)
+_STEPS = (
+    (_HANDLE_READ_VERSION_BATTERY, None),
+    (_HANDLE_WRITE_MODE_CHANGE,    _DATA_MODE_CHANGE),
+    (_HANDLE_READ_SENSOR_DATA,     None)
+)
+_N_STEPS = const(3)
+
 # States of state machine
 S_INIT                = const(0)
 S_SCAN_DONE           = const(1)
@@ -211,6 +281,63 @@ S_READ_FIRMWARE_DONE  = const(4)
 S_MODE_CHANGE_DONE    = const(5)
 S_READ_SENSOR_DONE    = const(6)
 
+# Number of states
+_N_STATES             = const(7)
+
+
+
+@micropython.viper
+def _oui(addr) -> int:
+    """
+    Organizationally Unique Identifier (first three bytes) of BLE MAC address as integer.
+
+    Viper code - the address buffer is accessed via a raw byte pointer.
+
+    Parameters:
+        addr (bytes): BLE MAC address (or memoryview)
+
+    Returns:
+        int: OUI
+    """
+    p = ptr8(addr)
+    return (p[0] << 16) | (p[1] << 8) | p[2]
+
+
+
+@micropython.native
+def _poll_until(pred, timeout_ms):
+    """
+    Poll until 'pred' is true or a timeout occurrs.
+
+    The polling interval increases from 1 ms to _T_WAIT; the last interval is clamped
+    to the remaining time, so the timeout is not overshot.
+    Native code - compiled to machine code instead of bytecode.
+    (Fallback for MiFlora.wait_for()/wait_for_connection() if uasyncio is not available.)
+
+    Parameters:
+        pred (function):   predicate to be polled
+        timeout_ms (int) : timeout in ms
+
+    Returns:
+        bool: True  pred became true,
+              False timeout ocurred.
+    """
+    # Note: Functions are bound to locals to avoid global/attribute lookups in the loop.
+    ticks_ms   = time.ticks_ms
+    ticks_diff = time.ticks_diff
+    sleep_ms   = time.sleep_ms
+    t0 = ticks_ms()
+    delay = 1
+
+    while True:
+        if pred():
+            return True
+        remaining = timeout_ms - ticks_diff(ticks_ms(), t0)
+        if remaining <= 0:
+            return False
+        sleep_ms(min(delay, remaining))
+        delay = min(delay << 1, _T_WAIT)
+
        
 class MiFlora:
     """
@@ -220,6 +347,18 @@ class MiFlora:
         _ble (object):                  ubluetooth.BLE object (see BLE docs)
         state (int):                    state of MiFlora state machine
         search_addr (bytes):            BLE MAC address of device to search for
+        search_service (UUID):          UUID of service to search for (see discover_services())
+        sensors (tuple):                BLE MAC addresses of sensors in batch mode (see set_sensors())
+        n_found (int):                  number of sensors found by scan in batch mode
+        addr_types (list):              per-sensor address type  (None if not found by scan)
+        names (list):                   per-sensor device name
+        rssis (list):                   per-sensor Received Signal Strength Indicator
+        versions (list):                per-sensor firmware version
+        batteries (list):               per-sensor battery status [%]
+        temps (list):                   per-sensor temperature [°C]
+        lights (list):                  per-sensor light intensity [lx]
+        moists (list):                  per-sensor moisture [%]
+        conds (list):                   per-sensor conductivity [µS/cm]
         addr_found (bool):              flag indicating whether device was found
         name (string):                  device name
         rssi (int):                     Received Signal Strength Indicator
@@ -229,20 +368,43 @@ class MiFlora:
         light (int):                    light intensity [lx]
         moist (int):                    moisture [%]
         cond (int):                     conductivity [µS/cm]
+        mtu (int):                      ATT MTU of current connection
+        services (dict):                discovered services (see discover_services())
+        characteristics (dict):         discovered characteristics (see discover_characteristics())
         _addr_type (int):               address type (PUBLIC or RANDOM) (see BLE docs)
         _addr (bytes):                  BLE MAC address
-        _value (memoryview):            cached data value (payload)
+        _index (int):                   index of selected sensor in batch mode (see select())
+        _ouis (set):                    OUIs of BLE MAC addresses searched for by scan()
+        _adv_seen (set):                advertisements (address, type) already printed during scan()
+        _value_buf (bytearray):         cached data value (payload), preallocated
+        _value_mv (memoryview):         memoryview of _value_buf
+        _value_len (int):               length of cached data value (None if we don't have one)
         _scan_callback (function):      callback for event _IRQ_SCAN_DONE
         _conn_callback (function):      callback for event _IRQ_PERIPHERAL_CONNECT
+        _disconn_callback (function):   callback for event _IRQ_PERIPHERAL_DISCONNECT
         _serv_done_callback (function): callback for event _IRQ_GATTC_SERVICE_DONE
         _char_done_callback (function): callback for event _IRQ_GATTC_CHARACTERISTIC_DONE
         _read_callback (function):      callback for event _IRQ_GATTC_READ_RESULT
         _write_callback (function):     callback for event _IRQ_GATTC_WRITE_DONE
+        _mtu_callback (function):       callback for event _IRQ_MTU_EXCHANGED
         _notify_callback (function):    callback for event _IRQ_GATTC_NOTIFY
         _conn_handle (int):             connection handle
+        _connected (bool):              connection status (_conn_handle is not None)
         _start_handle (int):            start handle (for characteristic discovery)
         _end_handle (int):              end   handle (for characteristic discovery)
         _value_handle (int):            value handle (for gattc_read()/gattc_write())
+        _handlers (list):               IRQ handler methods, indexed by interrupt request ID
+        _done_events (list):            ThreadSafeFlag per state, set when the state is entered,
+                                        indexed by state (None if uasyncio is not available)
+        _conn_event (ThreadSafeFlag):   set on each change of connection status (None if uasyncio is not available)
+        _notify_event (ThreadSafeFlag): set on each notification (None if uasyncio is not available)
+        _ring (list):                   notification ring buffer (preallocated bytearrays)
+        _ring_mv (list):                memoryviews of _ring
+        _ring_len (list):               notification data length per slot of _ring
+        _ring_head (int):               number of notifications received
+        _ring_tail (int):               number of notifications processed
+        _step_callbacks (tuple):        completion callbacks of AUTO_MODE sequence, indexed like _STEPS
+        _step (int):                    number of AUTO_MODE sequence steps issued so far
     """
 
     def __init__(self, ble):
@@ -253,15 +415,65 @@ class MiFlora:
             ble (ubluetooth.BLE):  ubluetooth.BLE object
         """
         self._ble = ble
+
+        # IRQ handler table, indexed by interrupt request ID
+        # (bound methods are created only once)
+        self._handlers = [None] * _N_IRQ_HANDLERS
+        self._handlers[_IRQ_SCAN_RESULT]                 = self._on_scan_result
+        self._handlers[_IRQ_SCAN_DONE]                   = self._on_scan_done
+        self._handlers[_IRQ_PERIPHERAL_CONNECT]          = self._on_peripheral_connect
+        self._handlers[_IRQ_PERIPHERAL_DISCONNECT]       = self._on_peripheral_disconnect
+        self._handlers[_IRQ_GATTC_SERVICE_RESULT]        = self._on_gattc_service_result
+        self._handlers[_IRQ_GATTC_SERVICE_DONE]          = self._on_gattc_service_done
+        self._handlers[_IRQ_GATTC_CHARACTERISTIC_RESULT] = self._on_gattc_characteristic_result
+        self._handlers[_IRQ_GATTC_CHARACTERISTIC_DONE]   = self._on_gattc_characteristic_done
+        self._handlers[_IRQ_GATTC_READ_RESULT]           = self._on_gattc_read_result
+        self._handlers[_IRQ_GATTC_READ_DONE]             = self._on_gattc_read_done
+        self._handlers[_IRQ_GATTC_WRITE_DONE]            = self._on_gattc_write_done
+        self._handlers[_IRQ_GATTC_NOTIFY]                = self._on_gattc_notify
+        self._handlers[_IRQ_MTU_EXCHANGED]               = self._on_mtu_exchanged
+
+        # Completion callbacks of AUTO_MODE sequence (see _STEPS)
+        self._step_callbacks = (self.read_firmware_done, self.mode_change_done, self.read_sensor_done)
+
         self._ble.active(True)
         self._ble.irq(self._irq)
 
+        # Events for waiting on state/connection changes (set from IRQ handlers)
+        if uasyncio:
+            self._done_events  = [uasyncio.ThreadSafeFlag() for _ in range(_N_STATES)]
+            self._conn_event   = uasyncio.ThreadSafeFlag()
+            self._notify_event = uasyncio.ThreadSafeFlag()
+        else:
+            self._done_events  = None
+            self._conn_event   = None
+            self._notify_event = None
+
+        # Read value buffer (preallocated - no allocation in IRQ handler)
+        self._value_buf = bytearray(_VALUE_BUF_SIZE)
+        self._value_mv  = memoryview(self._value_buf)
+
+        # Notification ring buffer (preallocated - no allocation in IRQ handler)
+        self._ring     = [bytearray(_NOTIFY_SLOT_SIZE) for _ in range(_NOTIFY_SLOTS)]
+        self._ring_mv  = [memoryview(buf) for buf in self._ring]
+        self._ring_len = [0] * _NOTIFY_SLOTS
+
+        self._ouis = set()
+        self._adv_seen = set()
+
+        # Service to search for by discover_services() (not reset on disconnect)
+        self.search_service  = None
+
+        # Discovery results (cleared by each discovery)
+        self.services        = {}
+        self.characteristics = {}
+        self.set_sensors(())
         self._reset()
 
 
     def _reset(self):
         # Init public members.
-        self.state       = S_INIT
+        self._set_state(S_INIT)
         self.search_addr = None
         self.addr_found  = False
         self.name        = None
@@ -278,215 +490,411 @@ class MiFlora:
         self._addr_type  = None
         self._addr       = None
 
+        # Selected sensor in batch mode.
+        self._index      = None
+
         # Cached value (if we have one).
-        self._value      = None
+        self._value_len  = None
 
         # Callbacks for completion of various operations.
         # These reset back to None after being invoked.
         self._scan_callback      = None
         self._conn_callback      = None
+        self._disconn_callback   = None
         self._serv_done_callback = None
         self._char_done_callback = None
         self._read_callback      = None
         self._write_callback     = None
+        self._mtu_callback       = None
          
         # Persistent callback for when new data is notified from the device.
         self._notify_callback = None
+        self._ring_head       = 0
+        self._ring_tail       = 0
 
         # Connected device.
         self._conn_handle     = None
+        self._connected       = False
+        if self._conn_event:
+            self._conn_event.set()
         self._start_handle    = None
         self._end_handle      = None
         self._value_handle    = None
+        self.mtu              = _MTU_DEFAULT
+
+        # AUTO_MODE sequence progress.
+        self._step            = 0
 
-    def _debug(self, text, debuglevel = 0):
+    def _debug(self, debuglevel, fmt, *args):
         """
         Debug output.
 
+        The text is only formatted if it is actually printed.
+
+        Parameters:
+            debuglevel (int): debuglevel must be less than or equal _VERBOSITY, otherwise text will not be printed
+            fmt (string):     string to be printed ('%' format string if args are provided)
+            args:             variables to be formatted into fmt
+        """
+        if (debuglevel > _VERBOSITY):
+            return
+        print(fmt % args if args else fmt)
+
+    def _set_state(self, state):
+        """
+        Set state of state machine and wake up task waiting for this state (if any).
+
         Parameters:
-            text (string):    string to be printed (including formatted variables, if desired)
-            debuglevel (int): debuglevel must be less than or equal VERBOSITY, otherwise text will not be printed
+            state (int): new state
         """
-        if (debuglevel <= VERBOSITY):
-            print(text)
+        self.state = state
+        if self._done_events:
+            self._done_events[state].set()
 
+    def _set_conn_handle(self, conn_handle):
+        """
+        Set connection handle and wake up waiting task (if any).
+
+        Parameters:
+            conn_handle (int): connection handle (None if not connected)
+        """
+        self._conn_handle = conn_handle
+        self._connected   = conn_handle is not None
+        if self._conn_event:
+            self._conn_event.set()
+
+    def _safe(self, fn, *args, **kwargs):
+        """
+        Call BLE method, ignoring OSError.
+
+        Parameters:
+            fn (function): method to be called
+            args:          positional arguments of fn
+            kwargs:        keyword arguments of fn
+
+        Returns:
+            bool: True  if fn was called without error,
+                  False otherwise
+        """
+        try:
+            fn(*args, **kwargs)
+            return True
+        except OSError as e:
+            return False
+
+    @micropython.native
     def _irq(self, event, data):
         """
         Interrupt request handler.
 
+        Dispatches the event to the handler method registered in '_handlers' (if any).
+        Native code - compiled to machine code instead of bytecode.
+
         See https://docs.micropython.org/en/latest/library/ubluetooth.html for description.
 
         Parameters:
             event (int):  interrupt request ID
             data (tuple): event specific data as tuple  
         """
-        self._debug("bt_irq - event: {}".format(event), 3)
-        
-        if event == _IRQ_SCAN_RESULT:
-            self._debug("bt irq - scan result", 2)
-            # A single scan result.
-            addr_type, addr, adv_type, rssi, adv_data = data
-            _addr_type = 'Public' if (addr_type == ADDR_TYPE_PUBLIC) else 'Random' 
-            _addr = bytes(addr)
-            _addr = binascii.hexlify(_addr)
-            if adv_type == _ADV_IND:
-                _adv_type = 'ADV_IND'
-            elif adv_type == _ADV_DIRECT_IND:
-                _adv_type = 'ADV_DIRECT_IND'
-            elif adv_type == _ADV_SCAN_IND:
-                _adv_type = 'ADV_SCAN_IND'
-            elif adv_type == _ADV_NONCONN_IND:
-                _adv_type = 'ADV_NONCONN_IND'
+        if _VERBOSITY >= 3:
+            self._debug(3, "bt_irq - event: %d", event)
+
+        if event < _N_IRQ_HANDLERS:
+            handler = self._handlers[event]
+            if handler:
+                handler(data)
+
+    def _start_steps(self):
+        """
+        Start AUTO_MODE sequence of GATT client accesses (see _STEPS).
+        """
+        self._step = 0
+        self._next_step()
+
+    def _next_step(self):
+        """
+        Issue next GATT client access of AUTO_MODE sequence (see _STEPS).
+
+        The access is issued directly (i.e. not via read_firmware()/mode_change()/read_sensor()),
+        it is advanced from _IRQ_GATTC_READ_DONE / _IRQ_GATTC_WRITE_DONE.
+        """
+        step = self._step
+        handle, data = _STEPS[step]
+        self._step = step + 1
+        self._value_handle = handle
+        if data is None:
+            self._read_callback = self._step_callbacks[step]
+            self._safe(self._ble.gattc_read, self._conn_handle, handle)
+        else:
+            self._write_callback = self._step_callbacks[step]
+            self._safe(self._ble.gattc_write, self._conn_handle, handle, data, 1)
+
+    def _on_scan_result(self, data):
+        """
+        Handler for _IRQ_SCAN_RESULT - a single scan result.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - scan result")
+        # Note: addr and adv_data are memoryviews of buffers owned by the caller - they are only
+        #       read within this handler (decode_name()/decode_services() accept any buffer),
+        #       copies are made only where the data is kept.
+        addr_type, addr, adv_type, rssi, adv_data = data
+        # Reject other manufacturers' devices by OUI before any further processing
+        # (only if devices to search for are given - otherwise all devices are reported).
+        if self._ouis and _oui(addr) not in self._ouis:
+            return
+        if _VERBOSITY >= 1:
+            # Print each advertisement (per device and advertising type) only once per scan
+            # - printing every packet would back-pressure the IRQ handler.
+            _key = (bytes(addr), adv_type)
+            if _key not in self._adv_seen:
+                self._adv_seen.add(_key)
+                _addr_type = _ADDR_TYPE_NAMES[addr_type]
+                _addr = _key[0].hex()
+                _adv_type = _ADV_TYPE_NAMES[adv_type]
+                self._debug(1, "addr_type: %s; addr: %s; adv_type: %s; rssi: %d dBm; name: %s; services: %s",
+                    _addr_type, _addr, _adv_type, rssi, decode_name(adv_data) or "?", decode_services(adv_data)
+                )
+
+        if adv_type not in (_ADV_IND, _ADV_DIRECT_IND, _ADV_SCAN_RSP):
+            return
+
+        if self.sensors:
+            # Batch mode - latch all sensors from a single scan.
+            # Note: addr is compared with the sensors' addresses without copying.
+            sensors = self.sensors
+            for i in range(len(sensors)):
+                if addr == sensors[i]:
+                    break
             else:
-                _adv_type = 'SCAN_RSP'
-            
-            _adv_data = bytes(adv_data)
-            _name = decode_name(_adv_data) or "?"
-            _services = decode_services(adv_data)
-            self._debug('addr_type: {}; addr: {}; adv_type: {}; rssi: {} dBm; name: {}; services: {}'.format(
-                _addr_type, _addr, _adv_type, rssi, _name, _services), 1
-            )
-
-            if adv_type in (_ADV_IND, _ADV_DIRECT_IND, _ADV_SCAN_RSP) and bytes(addr) == self.search_addr:
-                # Found a potential device, remember it and stop scanning.
-                self._addr_type = addr_type
-                self.rssi = rssi
-                self.addr_found = True
-                self._addr = bytes(
-                    addr
-                )  # Note: addr buffer is owned by caller so need to copy it.
-                if _name != '?':
-                    self.name = _name
-                self._debug('Device name: {}'.format(_name), 1)
+                return
+            if self.addr_types[i] is not None:
+                return
+            self.addr_types[i] = addr_type
+            self.rssis[i] = rssi
+            _name = decode_name(adv_data)
+            if _name:
+                self.names[i] = _name
+            if _VERBOSITY >= 1:
+                self._debug(1, "Sensor #%d found - name: %s", i, _name or "?")
+            self.n_found += 1
+            if self.n_found == len(self.sensors):
+                # All sensors found - stop scanning.
                 self._ble.gap_scan(None)
+            return
 
+        # Note: addr is a memoryview - the buffer is compared with search_addr without copying.
+        if addr != self.search_addr:
+            return
 
-        elif event == _IRQ_SCAN_DONE:
-            self._debug("bt irq - scan done", 2)
-            if self._scan_callback:
-                if self._addr:
-                    # Found a device during the scan (and the scan was explicitly stopped).
-                    self._scan_callback(self._addr_type, self._addr, self.name)
-                    self._scan_callback = None
-                    if AUTO_MODE:
-                        self.gap_connect(self._addr_type, self._addr)
-                else:
-                    # Scan timed out.
-                    self._scan_callback(None, None, None)
-
-        elif event == _IRQ_PERIPHERAL_CONNECT:
-            # gap_connect() successful.
-            self._debug("bt irq - peripheral connect", 2)
-            conn_handle, addr_type, addr = data
-            if addr_type == self._addr_type and addr == self._addr:
-                self._conn_handle = conn_handle
-                if self._conn_callback:
-                    self._conn_callback()
-                    self._conn_callback = None
+        # Found a potential device, remember it and stop scanning.
+        self._addr_type = addr_type
+        self.rssi = rssi
+        self.addr_found = True
+        self._addr = bytes(
+            addr
+        )  # Note: addr buffer is owned by caller so need to copy it.
+        _name = decode_name(adv_data) or "?"
+        if _name != '?':
+            self.name = _name
+        if _VERBOSITY >= 1:
+            self._debug(1, "Device name: %s", _name)
+        self._ble.gap_scan(None)
+
+    def _on_scan_done(self, data):
+        """
+        Handler for _IRQ_SCAN_DONE - scan duration finished or manually stopped.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - scan done")
+        if self._scan_callback:
+            if self.sensors:
+                # Batch mode - results are available in addr_types/names/rssis.
+                self._scan_callback(None, None, None)
+                self._scan_callback = None
+            elif self._addr:
+                # Found a device during the scan (and the scan was explicitly stopped).
+                self._scan_callback(self._addr_type, self._addr, self.name)
+                self._scan_callback = None
                 if AUTO_MODE:
-                    if _DISCOVER_SERVICES:
-                        self.discover_services()
-                    else:
-                        self.read_firmware(callback=self.read_firmware_done)
-        
-        elif event == _IRQ_PERIPHERAL_DISCONNECT:
-            # Disconnect (either initiated by us or the remote end).
-            conn_handle, _, _ = data
-            if conn_handle == self._conn_handle:
-                # If it was initiated by us, it'll already be reset.
-                self._reset()
-
-        elif event == _IRQ_GATTC_SERVICE_RESULT:
-            # Connected device returned a service.
-            self._debug("bt irq - gattc service result", 2)
-            conn_handle, start_handle, end_handle, uuid = data
-            
-            if conn_handle == self._conn_handle:
-                self._debug("{} -> service handle: {}...{}".format(uuid, start_handle, end_handle), 1)
-                self.services[str(uuid)] = start_handle, end_handle
-                if uuid == self.search_service:
-                    self._debug("Wanted service {} has been discovered!".format(self.search_service), 1)
-                    self._start_handle = start_handle
-                    self._end_handle   = end_handle
-
-        elif event == _IRQ_GATTC_SERVICE_DONE:
-            # Service query complete.
-            self._debug("bt irq - gattc service done", 2)
-            self.state = S_SERVICE_DONE
-            if self._serv_done_callback:
-                self._serv_done_callback()
-                self._serv_done_callback = None
+                    self.gap_connect(self._addr_type, self._addr)
+            else:
+                # Scan timed out.
+                self._scan_callback(None, None, None)
+
+    def _on_peripheral_connect(self, data):
+        """
+        Handler for _IRQ_PERIPHERAL_CONNECT - gap_connect() successful.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - peripheral connect")
+        conn_handle, addr_type, addr = data
+        if addr_type == self._addr_type and addr == self._addr:
+            self._set_conn_handle(conn_handle)
+            if self._conn_callback:
+                self._conn_callback()
+                self._conn_callback = None
             if AUTO_MODE:
-                if _DISCOVER_CHARACTERISTICS:
-                    # Note: In AUTO_MODE _start_handle/_end_handle should have been set according to desired service
-                    #       in _IRQ_GATTC_SERVICE_RESULT.
-                    if self._start_handle and self._end_handle:
-                        self.discover_characteristics(self._start_handle, self._end_handle)
-                    else:
-                        self._debug("Failed to find gattc service.", 3)
+                if _EXCHANGE_MTU:
+                    self.exchange_mtu(callback=self._auto_connected)
                 else:
-                    self.read_firmware(callback=self.read_firmware_done)
-                    
-        elif event == _IRQ_GATTC_CHARACTERISTIC_RESULT:
-            # Connected device returned a characteristic.
-            self._debug("bt irq - gattc characteristic result", 2)
-            conn_handle, def_handle, value_handle, properties, uuid = data
-            
-            if conn_handle == self._conn_handle:
-                self._debug("{}; def_handle: {}; value_handle: {}; properties: {}".format(
-                    uuid, def_handle, value_handle, properties), 1
+                    self._auto_connected()
+
+    def _auto_connected(self):
+        """
+        Proceed with AUTO_MODE after connection (and MTU exchange, if enabled).
+        """
+        if _DISCOVER_SERVICES:
+            self.discover_services()
+        else:
+            self._start_steps()
+
+    def _on_mtu_exchanged(self, data):
+        """
+        Handler for _IRQ_MTU_EXCHANGED - ATT MTU exchange complete (either initiated by us or the remote end).
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - mtu exchanged")
+        conn_handle, mtu = data
+        if conn_handle == self._conn_handle:
+            if _VERBOSITY >= 1:
+                self._debug(1, "MTU: %d", mtu)
+            self.mtu = mtu
+            if self._mtu_callback:
+                self._mtu_callback()
+                self._mtu_callback = None
+
+    def _on_peripheral_disconnect(self, data):
+        """
+        Handler for _IRQ_PERIPHERAL_DISCONNECT - disconnect (either initiated by us or the remote end).
+        """
+        conn_handle, _, _ = data
+        if conn_handle == self._conn_handle:
+            # If it was initiated by us, it'll already be reset.
+            self._reset()
+        if self._disconn_callback:
+            self._disconn_callback()
+            self._disconn_callback = None
+
+    def _on_gattc_service_result(self, data):
+        """
+        Handler for _IRQ_GATTC_SERVICE_RESULT - connected device returned a service.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc service result")
+        conn_handle, start_handle, end_handle, uuid = data
+        
+        if conn_handle == self._conn_handle:
+            if _VERBOSITY >= 1:
+                self._debug(1, "%s -> service handle: %d...%d", uuid, start_handle, end_handle)
+            self.services[uuid] = start_handle, end_handle
+            if uuid == self.search_service:
+                if _VERBOSITY >= 1:
+                    self._debug(1, "Wanted service %s has been discovered!", self.search_service)
+                self._start_handle = start_handle
+                self._end_handle   = end_handle
+
+    def _on_gattc_service_done(self, data):
+        """
+        Handler for _IRQ_GATTC_SERVICE_DONE - service query complete.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc service done")
+        self._set_state(S_SERVICE_DONE)
+        if self._serv_done_callback:
+            self._serv_done_callback()
+            self._serv_done_callback = None
+        if AUTO_MODE:
+            if _DISCOVER_CHARACTERISTICS:
+                # Note: In AUTO_MODE _start_handle/_end_handle should have been set according to desired service
+                #       in _IRQ_GATTC_SERVICE_RESULT.
+                if self._start_handle and self._end_handle:
+                    self.discover_characteristics(self._start_handle, self._end_handle)
+                else:
+                    if _VERBOSITY >= 3:
+                        self._debug(3, "Failed to find gattc service.")
+            else:
+                self._start_steps()
+
+    def _on_gattc_characteristic_result(self, data):
+        """
+        Handler for _IRQ_GATTC_CHARACTERISTIC_RESULT - connected device returned a characteristic.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc characteristic result")
+        conn_handle, def_handle, value_handle, properties, uuid = data
+        
+        if conn_handle == self._conn_handle:
+            if _VERBOSITY >= 1:
+                self._debug(1, "%s; def_handle: %d; value_handle: %d; properties: %d",
+                    uuid, def_handle, value_handle, properties
                 )
-                self.characteristics[str(uuid)] = def_handle, value_handle, properties
-
-        elif event == _IRQ_GATTC_CHARACTERISTIC_DONE:
-            # Characteristic query complete.
-            self._debug("bt irq - gattc characteristic done", 2)
-            self.state = S_CHARACTERISTIC_DONE
-            if self._char_done_callback:
-                self._char_done_callback()
-                self._char_done_callback = None
-            if AUTO_MODE:
-                self.read_firmware(callback=self.read_firmware_done)
-
-        elif event == _IRQ_GATTC_READ_RESULT:
-            # A read completed successfully.
-            self._debug("bt irq - gattc read result", 2)
-            conn_handle, value_handle, char_data = data
-            if conn_handle == self._conn_handle and value_handle == self._value_handle:
-                self._update_value(char_data)
-                if self._read_callback:
-                    self._read_callback(self._value)
-                    self._read_callback = None
-
-        elif event == _IRQ_GATTC_READ_DONE:
-            # Read completed (no-op).
-            self._debug("bt irq - gattc read done", 2)
-            conn_handle, value_handle, status = data
-            if AUTO_MODE and self.state == S_READ_FIRMWARE_DONE:
-                self.mode_change(self.mode_change_done)
-
-        elif event == _IRQ_GATTC_WRITE_DONE:
-            # A gattc_write() has completed.
-            # Note: The value_handle will be zero on btstack (but present on NimBLE).
-            # Note: Status will be zero on success, implementation-specific value otherwise.
-            self._debug("bt irq - gattc write done", 2)
-            conn_handle, value_handle, status = data
-            if conn_handle == self._conn_handle and value_handle == self._value_handle:
-                self._debug("status: {}".format(status), 3)
-                if self._write_callback:
-                    self._write_callback()
-                    self._write_callback = None
-                if AUTO_MODE and self.state == S_MODE_CHANGE_DONE:
-                    self.read_sensor(callback=self.read_sensor_done)
-
-        elif event == _IRQ_GATTC_NOTIFY:
-            self._debug("bt irq - gattc notify", 2)
-            
-            conn_handle, value_handle, notify_data = data
-            if conn_handle == self._conn_handle and value_handle == self._value_handle:
-                self._update_value(notify_data)
-                if self._notify_callback:
-                    self._notify_callback(self._value)
+            self.characteristics[uuid] = def_handle, value_handle, properties
+
+    def _on_gattc_characteristic_done(self, data):
+        """
+        Handler for _IRQ_GATTC_CHARACTERISTIC_DONE - characteristic query complete.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc characteristic done")
+        self._set_state(S_CHARACTERISTIC_DONE)
+        if self._char_done_callback:
+            self._char_done_callback()
+            self._char_done_callback = None
+        if AUTO_MODE:
+            self._start_steps()
+
+    def _on_gattc_read_result(self, data):
+        """
+        Handler for _IRQ_GATTC_READ_RESULT - a read completed successfully.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc read result")
+        conn_handle, value_handle, char_data = data
+        if conn_handle == self._conn_handle and value_handle == self._value_handle:
+            value = self._update_value(char_data)
+            if self._read_callback:
+                self._read_callback(value)
+                self._read_callback = None
+
+    def _on_gattc_read_done(self, data):
+        """
+        Handler for _IRQ_GATTC_READ_DONE - read completed (no-op).
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc read done")
+        conn_handle, value_handle, status = data
+        if AUTO_MODE and conn_handle == self._conn_handle and status == 0 and 0 < self._step < _N_STEPS:
+            self._next_step()
+
+    def _on_gattc_write_done(self, data):
+        """
+        Handler for _IRQ_GATTC_WRITE_DONE - a gattc_write() has completed.
+        """
+        # Note: The value_handle will be zero on btstack (but present on NimBLE).
+        # Note: Status will be zero on success, implementation-specific value otherwise.
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc write done")
+        conn_handle, value_handle, status = data
+        if conn_handle == self._conn_handle and value_handle == self._value_handle:
+            if _VERBOSITY >= 3:
+                self._debug(3, "status: %d", status)
+            if self._write_callback:
+                self._write_callback()
+                self._write_callback = None
+            if AUTO_MODE and status == 0 and 0 < self._step < _N_STEPS:
+                self._next_step()
+
+    def _on_gattc_notify(self, data):
+        """
+        Handler for _IRQ_GATTC_NOTIFY - a server has sent a notify request.
+        """
+        if _VERBOSITY >= 2:
+            self._debug(2, "bt irq - gattc notify")
+
+        conn_handle, value_handle, notify_data = data
+        if conn_handle == self._conn_handle and value_handle == self._value_handle:
+            self._queue_notify(notify_data)
 
     """
     Action trigger methods
@@ -497,17 +905,30 @@ class MiFlora:
 
         See https://docs.micropython.org/en/latest/library/ubluetooth.html for gap_scan() parameters.
 
+        In batch mode (see set_sensors()), the scan is only stopped early if all sensors were found
+        and callback is invoked with (None, None, None).
+
+        Advertisements of devices whose OUI (first three bytes of the MAC address) does not match
+        any of the addresses searched for are ignored (this also applies to the debug output).
+
         Parameters:
             callback (function): callback to be invoked in _IRQ_SCAN_DONE if the desired device
                                  was found in _IRQ_SCAN_RESULT
         """
+        self._set_state(S_INIT)
         self._addr_type = None
         self._addr = None
+        self.n_found = 0
+        for i in range(len(self.sensors)):
+            self.addr_types[i] = None
+            self.names[i]      = None
+            self.rssis[i]      = 0
+        self._ouis = {_oui(addr) for addr in self.sensors}
+        self._adv_seen.clear()
+        if self.search_addr:
+            self._ouis.add(_oui(self.search_addr))
         self._scan_callback = callback
-        try:
-            self._ble.gap_scan(2000, 30000, 30000, True)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gap_scan, 2000, 30000, 30000, True)
 
     def gap_connect(self, addr_type=None, addr=None, callback=None):
         """
@@ -525,7 +946,8 @@ class MiFlora:
                         (not connected yet!),
                   False otherwise
         """
-        self._debug("gap_connect()", 1)
+        if _VERBOSITY >= 1:
+            self._debug(1, "gap_connect()")
         if not(addr_type is None) and not(addr is None):
             # if provided, use address type and address provided as parameters
             # (otherwise use address type and address from preceeding scan)
@@ -533,34 +955,73 @@ class MiFlora:
             self._addr = addr
         self._conn_callback = callback
         if self._addr_type is None or self._addr is None:
-            self.debug("gap_connect(): Parameter error! _addr_type: {}; _addr: {}".format(
-                self._addr_type, self._addr), 1
-            )
-            return False
-        try:
-            self._ble.gap_connect(self._addr_type, self._addr)
-            return True
-        except OSError as e:
+            if _VERBOSITY >= 1:
+                self._debug(1, "gap_connect(): Parameter error! _addr_type: %s; _addr: %s",
+                    self._addr_type, self._addr
+                )
             return False
+        return self._safe(self._ble.gap_connect, self._addr_type, self._addr)
         
-    def disconnect(self):
+    def exchange_mtu(self, mtu=_MTU, callback=None):
+        """
+        Exchange ATT MTU with connected device.
+
+        Sets the preferred MTU and initiates the MTU exchange. The resulting MTU is stored in 'mtu'.
+
+        See https://docs.micropython.org/en/latest/library/ubluetooth.html for gattc_exchange_mtu().
+
+        Parameters:
+            mtu (int):           preferred MTU
+            callback (function): callback to be invoked in _IRQ_MTU_EXCHANGED
+                                 (or immediately if the exchange could not be initiated)
+        """
+        if _VERBOSITY >= 1:
+            self._debug(1, "exchange_mtu()")
+        if not self.is_connected():
+            return
+        self._mtu_callback = callback
+        self._safe(self._ble.config, mtu=mtu)
+        if not self._safe(self._ble.gattc_exchange_mtu, self._conn_handle):
+            # _IRQ_MTU_EXCHANGED will not occur - continue with default MTU
+            if _VERBOSITY >= 1:
+                self._debug(1, "exchange_mtu(): failed")
+            self._mtu_callback = None
+            if callback:
+                callback()
+
+    def disconnect(self, callback=None):
         """
         Disconnect from current device and reset object's attributes.
+
+        Note: The attributes are reset immediately, i.e. is_connected() returns False
+              before the disconnect has actually completed.
+
+        Parameters:
+            callback (function): callback to be invoked in _IRQ_PERIPHERAL_DISCONNECT
+                                 (or immediately if the disconnect could not be initiated)
         """
-        self._debug("disconnect()", 1)
-        if not self._conn_handle:
+        if _VERBOSITY >= 1:
+            self._debug(1, "disconnect()")
+        if not self.is_connected():
             return
-        try:
-            self._ble.gap_disconnect(self._conn_handle)
-        except OSError as e:
-            pass
+        # Note: The callback must be set before gap_disconnect() - the IRQ may be
+        #       dispatched before gap_disconnect() returns.
+        conn_handle = self._conn_handle
         self._reset()
+        self._disconn_callback = callback
+        if not self._safe(self._ble.gap_disconnect, conn_handle):
+            # _IRQ_PERIPHERAL_DISCONNECT will not occur - attributes have been reset already
+            if _VERBOSITY >= 1:
+                self._debug(1, "disconnect(): failed")
+            self._disconn_callback = None
+            if callback:
+                callback()
 
     def discover_services(self, callback=None):
         """
         Discover services provided by connected device.
 
-        All discovered services are stored in 'services'.
+        All discovered services are stored in 'services' (key: UUID object).
         For if service with UUID provided in 'search_service' was discovered,
         '_start_handle' and '_end_handle' for this service are stored.
         
@@ -568,21 +1029,19 @@ class MiFlora:
         Parameters:
             callback (function): callback to be invoked in _IRQ_GATTC_SERVICE_DONE
         """
-        self._debug("discover_services()", 1)
-        self.services = {}
+        if _VERBOSITY >= 1:
+            self._debug(1, "discover_services()")
+        self.services.clear()
         if not self.is_connected():
             return
         self._serv_done_callback = callback
-        try:
-            self._ble.gattc_discover_services(self._conn_handle)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gattc_discover_services, self._conn_handle)
 
     def discover_characteristics(self, start_handle, end_handle, callback=None):
         """
         Discover characteristics of connected device in range specified by start_handle/end_handle.
 
-        All discovered characteristics are stored in 'characteristics'.
+        All discovered characteristics are stored in 'characteristics' (key: UUID object).
         
         See https://docs.micropython.org/en/latest/library/ubluetooth.html for gattc_discover_services().
         
@@ -591,15 +1050,13 @@ class MiFlora:
             end_handle (int):    end of characteristic range
             callback (function): callback to be invoked in _IRQ_GATTC_CHARACTERISTIC_DONE
         """
-        self._debug("discover_characteristics()", 1)
-        self.characteristics = {}
+        if _VERBOSITY >= 1:
+            self._debug(1, "discover_characteristics()")
+        self.characteristics.clear()
         if not self.is_connected():
             return
         self._char_done_callback = callback
-        try:
-            self._ble.gattc_discover_characteristics(self._conn_handle, start_handle, end_handle)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gattc_discover_characteristics, self._conn_handle, start_handle, end_handle)
         
     def read(self, callback):
         """
@@ -612,14 +1069,12 @@ class MiFlora:
         Parameters:
             callback (function): callback to be invoked in _IRQ_GATTC_READ_RESULT
         """
-        self._debug("read()", 1)
+        if _VERBOSITY >= 1:
+            self._debug(1, "read()")
         if not self.is_connected():
             return
         self._read_callback = callback
-        try:
-            self._ble.gattc_read(self._conn_handle, self._value_handle)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gattc_read, self._conn_handle, self._value_handle)
 
     def read_firmware(self, callback):
         """
@@ -633,15 +1088,13 @@ class MiFlora:
         Parameters:
             callback (function): callback to be invoked in _IRQ_GATTC_READ_RESULT
         """
-        self._debug("read_firmware()", 1)
+        if _VERBOSITY >= 1:
+            self._debug(1, "read_firmware()")
         if not self.is_connected():
             return
         self._read_callback = callback
         self._value_handle = _HANDLE_READ_VERSION_BATTERY
-        try:
-            self._ble.gattc_read(self._conn_handle, self._value_handle)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gattc_read, self._conn_handle, self._value_handle)
    
     def mode_change(self, callback):
         """
@@ -655,13 +1108,11 @@ class MiFlora:
         Parameters:
             callback (function): callback to be invoked in _IRQ_GATTC_WRITE_DONE
         """
-        self._debug("mode_change()", 1)
+        if _VERBOSITY >= 1:
+            self._debug(1, "mode_change()")
         self._write_callback = callback
         self._value_handle = _HANDLE_WRITE_MODE_CHANGE
-        try:
-            self._ble.gattc_write(self._conn_handle, self._value_handle, _DATA_MODE_CHANGE, 1)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gattc_write, self._conn_handle, self._value_handle, _DATA_MODE_CHANGE, 1)
     
     def read_sensor(self, callback):
         """
@@ -675,16 +1126,85 @@ class MiFlora:
         Parameters:
             callback (function): callback to be invoked in _IRQ_GATTC_READ_RESULT
         """
-        self._debug("read_sensor()", 1)
+        if _VERBOSITY >= 1:
+            self._debug(1, "read_sensor()")
         if not self.is_connected():
             return
         self._read_callback = callback
         self._value_handle = _HANDLE_READ_SENSOR_DATA
-        try:
-            self._ble.gattc_read(self._conn_handle, self._value_handle)
-        except OSError as e:
-            pass
+        self._safe(self._ble.gattc_read, self._conn_handle, self._value_handle)
     
+    """
+    Awaitable action methods (coroutines)
+
+    The action is triggered and the coroutine waits until the expected state
+    is reached or a timeout occurred. Returns True if the expected state was reached.
+    (Requires uasyncio.)
+    """
+    async def scan_async(self, timeout_ms=2500):
+        """
+        Coroutine version of scan() - waits for S_SCAN_DONE.
+        """
+        self.scan(callback=self.scan_done)
+        return await self.await_state(S_SCAN_DONE, timeout_ms)
+
+    async def gap_connect_async(self, addr_type=None, addr=None, timeout_ms=3000):
+        """
+        Coroutine version of gap_connect() - waits until connected.
+        """
+        if not self.gap_connect(addr_type, addr):
+            return False
+        return await self.await_connection(True, timeout_ms)
+
+    async def disconnect_async(self, timeout_ms=10000):
+        """
+        Coroutine version of disconnect() - waits for _IRQ_PERIPHERAL_DISCONNECT.
+        """
+        if not self.is_connected():
+            return True
+        done = uasyncio.ThreadSafeFlag()
+        self.disconnect(callback=done.set)
+        try:
+            await uasyncio.wait_for_ms(done.wait(), timeout_ms)
+            return True
+        except uasyncio.TimeoutError:
+            return False
+
+    async def discover_services_async(self, timeout_ms=2500):
+        """
+        Coroutine version of discover_services() - waits for S_SERVICE_DONE.
+        """
+        self.discover_services()
+        return await self.await_state(S_SERVICE_DONE, timeout_ms)
+
+    async def discover_characteristics_async(self, start_handle, end_handle, timeout_ms=2500):
+        """
+        Coroutine version of discover_characteristics() - waits for S_CHARACTERISTIC_DONE.
+        """
+        self.discover_characteristics(start_handle, end_handle)
+        return await self.await_state(S_CHARACTERISTIC_DONE, timeout_ms)
+
+    async def read_firmware_async(self, timeout_ms=2000):
+        """
+        Coroutine version of read_firmware() - waits for S_READ_FIRMWARE_DONE.
+        """
+        self.read_firmware(callback=self.read_firmware_done)
+        return await self.await_state(S_READ_FIRMWARE_DONE, timeout_ms)
+
+    async def mode_change_async(self, timeout_ms=2000):
+        """
+        Coroutine version of mode_change() - waits for S_MODE_CHANGE_DONE.
+        """
+        self.mode_change(self.mode_change_done)
+        return await self.await_state(S_MODE_CHANGE_DONE, timeout_ms)
+
+    async def read_sensor_async(self, timeout_ms=2000):
+        """
+        Coroutine version of read_sensor() - waits for S_READ_SENSOR_DONE.
+        """
+        self.read_sensor(callback=self.read_sensor_done)
+        return await self.await_state(S_READ_SENSOR_DONE, timeout_ms)
+
     """
     Callback methods
     """
@@ -700,8 +1220,9 @@ class MiFlora:
             addr (bytes):    BLE MAC address
             name (string):   device name
         """
-        self._debug("scan_done()", 1)
-        self.state = S_SCAN_DONE
+        if _VERBOSITY >= 1:
+            self._debug(1, "scan_done()")
+        self._set_state(S_SCAN_DONE)
 
     def read_firmware_done(self, data):
         """
@@ -712,18 +1233,53 @@ class MiFlora:
         Parameters:
             data (memoryview): read data
         """        
-        self._debug("read_firmware_done()", 1)
-        data = bytes(data)
+        if _VERBOSITY >= 1:
+            self._debug(1, "read_firmware_done()")
         self.battery = data[0]
-        self.version = str(data[2:7], 'UTF-8')
-        self.state = S_READ_FIRMWARE_DONE
+        # Only the version field is copied
+        self.version = bytes(memoryview(data)[2:7]).decode()
+        if self._index is not None:
+            self.batteries[self._index] = self.battery
+            self.versions[self._index]  = self.version
+        self._set_state(S_READ_FIRMWARE_DONE)
+
+    @micropython.viper
+    def _parse_sensor(self, buf: ptr8) -> int:
+        """
+        Parse sensor data (little endian).
+
+        Viper code - the data is accessed via a raw byte pointer and processed as machine integers.
+
+        Layout:
+            0..1: temperature [0.1 °C] (signed)
+            2:    unused
+            3..6: light intensity [lx]
+            7:    moisture [%]
+            8..9: conductivity [µS/cm]
+
+        Light intensity, moisture and conductivity are stored in 'light', 'moist' and 'cond'.
+
+        Parameters:
+            buf (memoryview): read data
+
+        Returns:
+            int: temperature [0.1 °C]
+        """
+        t = int(buf[0]) | (int(buf[1]) << 8)
+        if t >= 0x8000:
+            t -= 0x10000
+        self.light = int(buf[3]) | (int(buf[4]) << 8) | (int(buf[5]) << 16) | (int(buf[6]) << 24)
+        self.moist = int(buf[7])
+        self.cond  = int(buf[8]) | (int(buf[9]) << 8)
+        return t
 
     def mode_change_done(self):
         """
         Callback for mode_change().
         """        
-        self._debug("mode_change_done()", 1)
-        self.state = S_MODE_CHANGE_DONE
+        if _VERBOSITY >= 1:
+            self._debug(1, "mode_change_done()")
+        self._set_state(S_MODE_CHANGE_DONE)
 
     def read_sensor_done(self, data):
         """
@@ -734,21 +1290,25 @@ class MiFlora:
         Parameters:
             data (memoryview): read data
         """        
-        self._debug("read_sensor_done()", 1)
-        data = bytes(data)
-        self._debug("data(): {}".format(data), 3)
-        # Note 1: ustruct.unpack() does not support padding
-        #         (cf. https://docs.micropython.org/en/latest/library/ustruct.html)
-        # Note 2: (u)struct() always returns a tuple, even if the result is a single element
-        temp  = struct.unpack("<h", data[0:2])
-        light = struct.unpack("<I", data[3:7])
-        moist = struct.unpack("<B", data[7:8])
-        cond  = struct.unpack("<h", data[8:10])
-        self.temp  = temp[0]/10.0
-        self.light = light[0]
-        self.moist = moist[0]
-        self.cond  = cond[0]
-        self.state = S_READ_SENSOR_DONE
+        if _VERBOSITY >= 1:
+            self._debug(1, "read_sensor_done()")
+        if _VERBOSITY >= 3:
+            self._debug(3, "data(): %s", bytes(data))
+        # Note: _parse_sensor() accesses the buffer without bounds checking -
+        #       ignore incomplete data (wait_for() will time out)
+        if len(data) < 10:
+            if _VERBOSITY >= 1:
+                self._debug(1, "read_sensor_done(): invalid data length: %d", len(data))
+            return
+        # Parsed directly from the memoryview - no need to copy the data
+        self.temp  = self._parse_sensor(data)/10.0
+        if self._index is not None:
+            i = self._index
+            self.temps[i]  = self.temp
+            self.lights[i] = self.light
+            self.moists[i] = self.moist
+            self.conds[i]  = self.cond
+        self._set_state(S_READ_SENSOR_DONE)
 
     """
     Status query methods
@@ -761,13 +1321,69 @@ class MiFlora:
             bool: True  if connected,
                   False otherwise.
         """
-        return self._conn_handle is not None
+        return self._connected
+
+    async def _wait_event(self, event, pred):
+        """
+        Wait on 'event' until 'pred' is true.
+
+        Parameters:
+            event (ThreadSafeFlag): event signalling a change
+            pred (function):        predicate to be checked after each change
+        """
+        while not pred():
+            await event.wait()
+
+    async def await_connection(self, status, timeout_ms):
+        """
+        Wait until connection reaches 'status' or a timeout occurrs (coroutine).
+
+        The waiting task is woken up by the IRQ handler on each change of the connection status.
+
+        Parameters:
+            status (bool):     expected connection status
+            timeout_ms (int) : timeout in ms
+
+        Returns:
+            bool: True  desired status occurred,
+                  False timeout ocurred.
+        """
+        try:
+            await uasyncio.wait_for_ms(self._wait_event(self._conn_event, lambda: self.is_connected() == status),
+                                       timeout_ms)
+            return True
+        except uasyncio.TimeoutError:
+            return False
+
+    async def await_state(self, state, timeout_ms):
+        """
+        Wait until 'state' is reached or a timeout occurrs (coroutine).
+
+        The waiting task is woken up by the IRQ handler only when 'state' is entered
+        (each state has its own event).
+
+        Parameters:
+            state (int):       expected state
+            timeout_ms (int) : timeout in ms
+
+        Returns:
+            bool: True  desired state occurred,
+                  False timeout ocurred.
+        """
+        try:
+            await uasyncio.wait_for_ms(self._wait_event(self._done_events[state], lambda: self.state == state),
+                                       timeout_ms)
+            return True
+        except uasyncio.TimeoutError:
+            return False
 
     def wait_for_connection(self, status, timeout_ms):
         """
         Wait until connection reaches 'status' or a timeout occurrs.
 
-        The connection status is polled in _T_WAIT intervals.
+        Blocking version of await_connection() (must not be called from a coroutine).
+        If uasyncio is not available, the connection status is polled in intervals
+        increasing from 1 ms to _T_WAIT.
 
         Parameters:
             status (bool):     expected connection status
@@ -777,251 +1393,317 @@ class MiFlora:
             bool: True  desired status occurred,
                   False timeout ocurred.
         """
-        t0 = time.ticks_ms()
-        
-        while time.ticks_diff(time.ticks_ms(), t0) < timeout_ms:
-            if self.is_connected() == status:
-                return True
-            time.sleep_ms(_T_WAIT)
-        return False
+        if uasyncio:
+            return uasyncio.run(self.await_connection(status, timeout_ms))
+
+        return _poll_until(lambda: self._connected == status, timeout_ms)
 
     def wait_for(self, state, timeout_ms):
         """
         Wait until 'state' is reached or a timeout occurrs.
 
-        The state is polled in _T_WAIT intervals.
+        Blocking version of await_state() (must not be called from a coroutine).
+        If uasyncio is not available, the state is polled in intervals
+        increasing from 1 ms to _T_WAIT.
 
         Parameters:
-            status (bool):     expected connection status
+            state (int):       expected state
             timeout_ms (int) : timeout in ms
 
         Returns:
-            bool: True  desired status occurred,
+            bool: True  desired state occurred,
                   False timeout ocurred.
         """
-        t0 = time.ticks_ms()
-        while time.ticks_diff(time.ticks_ms(), t0) < timeout_ms:
-            if self.state == state:
-                return True
-            time.sleep_ms(_T_WAIT)
-        return False
+        if uasyncio:
+            return uasyncio.run(self.await_state(state, timeout_ms))
+
+        return _poll_until(lambda: self.state == state, timeout_ms)
 
     """
     Helper methods
     """
+    def set_sensors(self, addrs):
+        """
+        Set the sensors to be handled in batch mode.
+
+        In batch mode, a single scan() latches the advertisements of all sensors in 'addrs'.
+        The sensors are then accessed one after the other (see select()) and the results
+        are stored in the per-sensor lists, which are indexed like 'addrs'.
+        An empty 'addrs' disables batch mode (single device mode with 'search_addr').
+
+        Parameters:
+            addrs (tuple): BLE MAC addresses (bytes) of the sensors
+        """
+        n = len(addrs)
+        self.sensors     = addrs
+        self.n_found     = 0
+        self.addr_types  = [None] * n
+        self.names       = [None] * n
+        self.rssis       = [0] * n
+        self.versions    = [None] * n
+        self.batteries   = [None] * n
+        self.temps       = [None] * n
+        self.lights      = [None] * n
+        self.moists      = [None] * n
+        self.conds       = [None] * n
+
+    def select(self, index):
+        """
+        Select sensor in batch mode for subsequent gap_connect().
+
+        The address type, name and RSSI are taken from the preceding scan (if any).
+        The sensor's previous results are cleared, i.e. they remain None if reading fails.
+
+        Parameters:
+            index (int): index of sensor in 'sensors'
+
+        Returns:
+            bool: True  if the sensor was found by the preceding scan,
+                  False otherwise (address type ADDR_TYPE_PUBLIC is assumed)
+        """
+        addr_type        = self.addr_types[index]
+        self._index      = index
+        self.search_addr = self.sensors[index]
+        self.addr_found  = addr_type is not None
+        self._addr_type  = ADDR_TYPE_PUBLIC if addr_type is None else addr_type
+        self._addr       = self.sensors[index]
+        self.name        = self.names[index]
+        self.rssi        = self.rssis[index]
+        self.versions[index]  = None
+        self.batteries[index] = None
+        self.temps[index]     = None
+        self.lights[index]    = None
+        self.moists[index]    = None
+        self.conds[index]     = None
+        return self.addr_found
+
     def on_notify(self, callback):
         """
         Set a callback for device notifications.
+
+        The notifications are queued by the IRQ handler and passed to the callback
+        in batches by process_notify() - either called by the application
+        or by notify_task() (requires uasyncio).
                 
         Parameters:
-            callback (function): callback to be invoked in _IRQ_GATTC_NOTIFY
+            callback (function): callback to be invoked with a list of notification data (memoryviews)
         """        
-        self._debug("on_notify()", 1)
+        if _VERBOSITY >= 1:
+            self._debug(1, "on_notify()")
         self._notify_callback = callback
 
+    def _queue_notify(self, data):
+        """
+        Copy notification data into the ring buffer and wake up waiting task (if any).
+
+        The data is copied into a preallocated slot. If the ring buffer is full,
+        the oldest notification is overwritten.
+
+        Parameters:
+            data (memoryview): notification data (payload)
+        """
+        if len(data) > _NOTIFY_SLOT_SIZE:
+            data = data[:_NOTIFY_SLOT_SIZE]
+        n = len(data)
+        i = self._ring_head % _NOTIFY_SLOTS
+        self._ring[i][:n] = data
+        self._ring_len[i] = n
+        self._ring_head += 1
+        if self._ring_head - self._ring_tail > _NOTIFY_SLOTS:
+            self._ring_tail = self._ring_head - _NOTIFY_SLOTS
+        if self._notify_event:
+            self._notify_event.set()
+
+    def process_notify(self):
+        """
+        Pass all pending notifications to the callback set by on_notify().
+
+        Must be called from the application (not from IRQ context).
+        The callback is invoked once with a list of memoryviews (oldest first),
+        which are only valid until the callback returns.
+
+        Returns:
+            int: number of notifications processed
+        """
+        head = self._ring_head
+        tail = self._ring_tail
+        if head == tail:
+            return 0
+        batch = []
+        for k in range(tail, head):
+            i = k % _NOTIFY_SLOTS
+            batch.append(self._ring_mv[i][:self._ring_len[i]])
+        self._ring_tail = head
+        if self._notify_callback:
+            self._notify_callback(batch)
+        return head - tail
+
+    async def notify_task(self):
+        """
+        Process notifications as they arrive (coroutine, runs until cancelled).
+
+        Requires uasyncio - otherwise process_notify() must be called periodically.
+
+        See process_notify().
+        """
+        if self._notify_event is None:
+            raise RuntimeError("notify_task() requires uasyncio - use process_notify() instead")
+        while True:
+            await self._notify_event.wait()
+            self.process_notify()
+
+    @micropython.native
     def _update_value(self, data):
         """
-        Update value from a notification or a read access.
+        Update value from a read access.
+
+        Native code - compiled to machine code instead of bytecode.
+
+        The data is copied into the preallocated buffer '_value_buf'
+        (the buffer of the IRQ's memoryview is owned by the caller).
 
         Parameters:
-            data (memoryview): notification/read data (payload)
+            data (memoryview): read data (payload)
             
         Returns:
             memoryview: object in memory containing payload data
         """
-        self._debug("_update_value()", 2)
-        self._value = data
-        return self._value
+        if _VERBOSITY >= 2:
+            self._debug(2, "_update_value()")
+        if len(data) > _VALUE_BUF_SIZE:
+            data = data[:_VALUE_BUF_SIZE]
+        n = len(data)
+        self._value_buf[:n] = data
+        self._value_len = n
+        return self._value_mv[:n]
             
     def value(self):
         """
-        Read access function for '_value'. (?) 
+        Read access function for cached value.
+
+        Returns:
+            memoryview: payload data of last read access (None if we don't have one)
         """
-        return self._value
+        if self._value_len is None:
+            return None
+        return self._value_mv[:self._value_len]
 ### END class MiFlora
 
 
-# Stand-alone version of MiFlora.wait_for() - obsolete!
-def wait_for(obj, state, timeout_ms):
-
-    t0 = time.ticks_ms()
-    while time.ticks_diff(time.ticks_ms(), t0) < timeout_ms:
-        if getattr(obj, 'state') == state:
-            return True
-        time.sleep_ms(_T_WAIT)
-    return False
-
-# Stand-alone version of MiFlora.wait_for_connection() - obsolete!
-def wait_for_connection(obj, status, timeout_ms):
-    t0 = time.ticks_ms()
-    
-    while time.ticks_diff(time.ticks_ms(), t0) < timeout_ms:
-        if obj.is_connected() == status:
-            return True
-        time.sleep_ms(_T_WAIT)
-    return False
-
-
 ###############################################################################
-# demo_man() - test function for class MiFlora ("manual" mode)
+# demo() - test function for class MiFlora
+#
+# All sensors are searched for by a single scan (batch mode), then each sensor
+# is read by _drive(). The access depends on AUTO_MODE (since AUTO_MODE is a
+# const(), only the selected branch is compiled):
 #
+# AUTO_MODE:
+# Sensor access is initiated and runs in background until completed
+# (or a timeout ocurred).
+# This is the preferred example for an application using MiFlora sensors.
+#
+# Otherwise ("manual" mode):
 # Sensor access is controlled step-by-step from the application. Typically an
 # action is trigged, a callback function is invoked upon completion and the 
 # application waits until the expected state of the MiFlora class is reached
-# (or a timeout occurred).
-#
+# (or a timeout occurred). The actions are awaited as coroutines (uasyncio).
 # This is example might be useful as a base for integrating other BLE devices.  
 ###############################################################################
-def demo_man():
-    ble = ubluetooth.BLE()
-    mf = MiFlora(ble)
-    print("demo_man()")
-    
-    while True:
-        for addr in miflora_sensors:
-            mf.search_addr    = addr
-            mf.search_service = _GENERIC_ACCESS_SERVICE_UUID
+async def _drive(mf, i, addr_str):
+    if not mf.select(i) and SCAN_DEVICES:
+        print("Sensor with MAC address {} not found!".format(addr_str))
+        return
 
-            if SCAN_DEVICES:
-                print("Searching for device with MAC address {}...".format(binascii.hexlify(addr)))
-                
-                mf.scan(callback=mf.scan_done)
-                
-                if mf.wait_for(S_SCAN_DONE, 2500):
-                    print("Scan done.")
-                else:
-                    print("Scan timeout!")
-                    continue
-                    
-                if mf.addr_found == False:
-                    print("Sensor not found!")
-                    continue
-                
-                print("Sensor '{}' found.".format(mf.name))
-                print("RSSI: {}dbB".format(mf.rssi))
-        
-            print("Trying to connect to device with MAC address {}...".format(binascii.hexlify(addr)))
-            rc = mf.gap_connect(ADDR_TYPE_PUBLIC, addr)
-            print("gap_connect() = ", rc)
-            
-            if mf.wait_for_connection(True, 3000):
-                print("Connected")
-            else:
-                print("Connection failed!")
-                continue
-            
-            if DISCOVER_SERVICES:
-                mf.discover_services()
-                
-                if mf.wait_for(S_SERVICE_DONE, 2500):
-                    print(mf.services)
-                else:
-                    print("discover_services failed!")
-                
-            if DISCOVER_CHARACTERISTICS:
-                mf.discover_characteristics(1, 9)
-                
-                if mf.wait_for(S_CHARACTERISTIC_DONE, 2500):
-                    print(mf.characteristics)
-                else:
-                    print("discover_characteristics failed!")
-            
-            mf.read_firmware(callback=mf.read_firmware_done)
-        
-            if mf.wait_for(S_READ_FIRMWARE_DONE, 2000):
-                print("Battery Level: {}%".format(mf.battery))
-                print("Version: {}".format(mf.version))
-        
-                mf.mode_change(mf.mode_change_done)
-        
-                if not mf.wait_for(S_MODE_CHANGE_DONE, 2000):
-                    print("Mode change failed!")
-                    break;
-            
-                mf.read_sensor(callback=mf.read_sensor_done)
-                
-                if mf.wait_for(S_READ_SENSOR_DONE, 2000):
-                     print("Temperature: {}°C Light: {}lx Moisture: {}% Conductivity: {}µS/cm".format(
-                        mf.temp, mf.light, mf.moist, mf.cond)
-                    )
-                else:
-                    print("Reading sensor data failed!")
-            else:
-                print("Reading sensor firmware version and battery status failed!")
+    if SCAN_DEVICES:
+        print("Sensor '{}' found.".format(mf.names[i]))
+        print("RSSI: {}dbB".format(mf.rssis[i]))
 
-            mf.disconnect()
-            
-            if mf.wait_for_connection(False, 10000):
-                print("Disconnected")
+    print("Trying to connect to device with MAC address {}...".format(addr_str))
+
+    if AUTO_MODE:
+        rc = mf.gap_connect()
+        print("gap_connect() = ", rc)
+
+        ########################################
+        # Time to perform other tasks...
+        ########################################
+
+        # The time required depends on the selected service discovery/characteristics
+        # discovery options.
+        ok = await mf.await_state(S_READ_SENSOR_DONE, 20000)
+        if not ok:
+            print("Reading sensor data failed (timeout)!")
+    else:
+        if await mf.gap_connect_async(timeout_ms=3000):
+            print("Connected")
+        else:
+            print("Connection failed!")
+            return
+
+        if DISCOVER_SERVICES:
+            if await mf.discover_services_async(2500):
+                print(mf.services)
             else:
-                print("Disconnect failed!")
-                mf._reset()
+                print("discover_services failed!")
 
-        print("Sleeping {} seconds...".format(_T_CYCLE))
-        time.sleep(_T_CYCLE)
+        if DISCOVER_CHARACTERISTICS:
+            if await mf.discover_characteristics_async(1, 9, 2500):
+                print(mf.characteristics)
+            else:
+                print("discover_characteristics failed!")
+
+        ok = False
+        if not await mf.read_firmware_async(2000):
+            print("Reading sensor firmware version and battery status failed!")
+        elif not await mf.mode_change_async(2000):
+            print("Mode change failed!")
+        elif not await mf.read_sensor_async(2000):
+            print("Reading sensor data failed!")
+        else:
+            ok = True
+
+    if ok:
+        print("Battery Level: {}%".format(mf.batteries[i]))
+        print("Version: {}".format(mf.versions[i]))
+        print("Temperature: {}°C Light: {}lx Moisture: {}% Conductivity: {}µS/cm".format(
+            mf.temps[i], mf.lights[i], mf.moists[i], mf.conds[i])
+        )
+
+    if await mf.disconnect_async(10000):
+        print("Disconnected")
+    else:
+        print("Disconnect failed (timeout)!")
+        mf._reset()
 
 
-###############################################################################
-# demo_auto() - test function for class MiFlora (auto mode)
-#
-# Sensor access is initiated and runs in background until # completed
-# (or a timeout ocurred).
-#
-# This is the preferred example for an application using MiFlora sensors.  
-###############################################################################
-def demo_auto():
+async def demo():
     ble = ubluetooth.BLE()
     mf = MiFlora(ble)
-    print("demo_auto()")
+    mf.set_sensors(miflora_sensors)
+    mf.search_service = _GENERIC_ACCESS_SERVICE_UUID
+    print("demo()")
+
+    # Printable MAC addresses (computed once)
+    addr_strs = [addr.hex() for addr in miflora_sensors]
 
     while True:
-        
-        for addr in miflora_sensors:
-            mf.search_addr    = addr
-            mf.search_service = _GENERIC_ACCESS_SERVICE_UUID
 
-            if SCAN_DEVICES:
-                print("Searching for device with MAC address {}...".format(binascii.hexlify(addr)))
-                
-                mf.scan(callback=mf.scan_done)
-            else:
-                print("Trying to connect to device with MAC address {}...".format(binascii.hexlify(addr)))
-                
-                rc = mf.gap_connect(ADDR_TYPE_PUBLIC, addr)
-                print("gap_connect() = ", rc)
-                
-            ########################################
-            # Time to perform other tasks...
-            ########################################
-            
-            # The time required depends on the number of visible devices and
-            # the selected service discovery/characteristics discovery options.
-            if mf.wait_for(S_READ_SENSOR_DONE, 20000):
-                if SCAN_DEVICES:
-                    print("Sensor '{}' found.".format(mf.name))
-                    print("RSSI: {}dbB".format(mf.rssi))
-                print("Battery Level: {}%".format(mf.battery))
-                print("Version: {}".format(mf.version))
-                print("Temperature: {}°C Light: {}lx Moisture: {}% Conductivity: {}µS/cm".format(
-                    mf.temp, mf.light, mf.moist, mf.cond)
-                )
-            else:
-                print("Reading sensor data failed (timeout)!")
+        if SCAN_DEVICES:
+            # A single scan for all sensors (batch mode)
+            print("Searching for {} device(s)...".format(len(miflora_sensors)))
 
-            mf.disconnect()
-            
-            if mf.wait_for_connection(False, 10000):
-                print("Disconnected")
+            if await mf.scan_async(2500):
+                print("Scan done - {} device(s) found.".format(mf.n_found))
             else:
-                print("Disconnect failed (timeout)!")
-                mf._reset()
+                print("Scan timeout!")
+
+        for i in range(len(miflora_sensors)):
+            await _drive(mf, i, addr_strs[i])
 
+        # Other tasks can run during the pause.
         print("Sleeping {} seconds...".format(_T_CYCLE))
-        time.sleep(_T_CYCLE)
+        await uasyncio.sleep(_T_CYCLE)
 
 
 if __name__ == "__main__":
-    if AUTO_MODE:
-        demo_auto()
-    else:
-        demo_man()
+    uasyncio.run(demo())